@@ -1,8 +1,8 @@
-from builtins import (map, open, str)
+from builtins import (map, str)
 __author__ = 'ahbbollen'
 
 from tempfile import NamedTemporaryFile
-from subprocess import check_call, call
+from subprocess import check_call, Popen, PIPE
 import os
 import warnings
 
@@ -19,11 +19,27 @@ PRIMER3_SCRIPT = os.path.join(os.path.join(os.path.dirname(__file__),
                                            "static"), 'getprimers.sh')
 
 
+_FASTA_HANDLES = {}
+
+
+def _get_fasta(reference):
+    """
+    Get a Fasta handle for reference.
+    Handles are opened once per process and reused, so worker processes
+    never share a file offset with their parent
+    """
+    key = (os.getpid(), reference)
+    if key not in _FASTA_HANDLES:
+        _FASTA_HANDLES[key] = Fasta(reference)
+    return _FASTA_HANDLES[key]
+
+
 def get_sequence_fasta(region, reference=None, padding=True):
-    ref = Fasta(reference)
-    if "chr" not in list(ref.keys())[0] and "chr" in region.chr:
+    ref = _get_fasta(reference)
+    first_contig = next(iter(ref.keys()))
+    if "chr" not in first_contig and "chr" in region.chr:
         chrom = region.chr.split("chr")[1]
-    elif "chr" not in region.chr and "chr" in list(ref.keys())[0]:
+    elif "chr" not in region.chr and "chr" in first_contig:
         chrom = "chr" + region.chr
     else:
         chrom = region.chr
@@ -53,20 +69,31 @@ def run_primer3(sequence, region, padding=True,
     return primers
 
 
+_SAMTOOLS_VERSION_CHECKS = {}
+
+
 def samtools_version_check(samtools_exe):
-    """Check whether samtools version >= 1.3.0"""
-    out = NamedTemporaryFile()
+    """
+    Check whether samtools version >= 1.3.0
+    The result is cached per samtools executable
+    """
+    if samtools_exe not in _SAMTOOLS_VERSION_CHECKS:
+        _SAMTOOLS_VERSION_CHECKS[samtools_exe] = _samtools_version_check(
+            samtools_exe
+        )
+    return _SAMTOOLS_VERSION_CHECKS[samtools_exe]
+
 
+def _samtools_version_check(samtools_exe):
     args = [samtools_exe, "--version"]
-    r = call(args, stdout=out)
+    proc = Popen(args, stdout=PIPE, universal_newlines=True)
+    stdout, _ = proc.communicate()
 
-    if r != 0:  # old samtools versions do not have a version command
+    # old samtools versions do not have a version command
+    if proc.returncode != 0:
         return False
 
-    with open(out.name, "r") as handle:
-        lines = handle.readlines()
-
-    version_line = lines[0]
+    version_line = stdout.splitlines()[0]
     try:
         return is_at_least_version_samtools(version_line, (1, 3))
     except ValueError:
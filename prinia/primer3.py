@@ -1,11 +1,35 @@
-from tempfile import NamedTemporaryFile
-from subprocess import check_call
-import os
-
-import re
+from subprocess import Popen, PIPE, CalledProcessError
 
 from .models import Primer
 
+_SEQ_PREFIX = "PRIMER_LEFT_"
+_SEQ_SUFFIX = "_SEQUENCE"
+
+# config lines that do not depend on the template or settings
+_STATIC_CFG = "\n".join([
+    "SEQUENCE_ID=example",
+    "PRIMER_TASK=pick_detection_primers",
+    "PRIMER_PICK_LEFT_PRIMER=1",
+    "PRIMER_PICK_INTERNAL_OLIGO=0",
+    "PRIMER_PICK_RIGHT_PRIMER=1",
+    "PRIMER_MIN_GC=20.0",
+    "PRIMER_INTERNAL_MIN_GC=20.0",
+    "PRIMER_MAX_GC=80.0",
+    "PRIMER_INTERNAL_MAX_GC=80.0",
+    "PRIMER_WT_GC_PERCENT_LT=0.0",
+    "PRIMER_INTERNAL_WT_GC_PERCENT_LT=0.0",
+    "PRIMER_GC_CLAMP=0",
+    "PRIMER_MAX_END_GC=5",
+    "PRIMER_MAX_NS_ACCEPTED=0",
+    "PRIMER_PAIR_WT_PRODUCT_SIZE_GT=0.1",
+    "PRIMER_PAIR_WT_PRODUCT_SIZE_LT=0.1",
+    "P3_FILE_FLAG=0",
+    "SEQUENCE_INTERNAL_EXCLUDED_REGION=37,21",
+    "PRIMER_EXPLAIN_FLAG=1",
+    "PRIMER_NUM_RETURN=200",
+    ""
+])
+
 
 class Primer3(object):
 
@@ -35,117 +59,100 @@ class Primer3(object):
             (float((self.max_product_size - self.min_product_size)) / 2)
         )
 
-    def create_config(self, handle):
-        """Create config for primer3."""
-
-        cfg_str = "SEQUENCE_ID=example\n" \
-                  "SEQUENCE_TEMPLATE={seq}\n" \
-                  "SEQUENCE_TARGET={tar}\n" \
-                  "SEQUENCE_EXCLUDED_REGION={exc}\n" \
-                  "PRIMER_TASK=pick_detection_primers\n" \
-                  "PRIMER_PICK_LEFT_PRIMER=1\n" \
-                  "PRIMER_PICK_INTERNAL_OLIGO=0\n" \
-                  "PRIMER_PICK_RIGHT_PRIMER=1\n" \
-                  "PRIMER_MIN_GC=20.0\n" \
-                  "PRIMER_INTERNAL_MIN_GC=20.0\n" \
-                  "PRIMER_OPT_GC_PERCENT={gc}\n" \
-                  "PRIMER_MAX_GC=80.0\n" \
-                  "PRIMER_INTERNAL_MAX_GC=80.0\n" \
-                  "PRIMER_WT_GC_PERCENT_LT=0.0\n" \
-                  "PRIMER_INTERNAL_WT_GC_PERCENT_LT=0.0\n" \
-                  "PRIMER_GC_CLAMP=0\n" \
-                  "PRIMER_MAX_END_GC=5\n" \
-                  "PRIMER_OPT_SIZE={size}\n" \
-                  "PRIMER_MIN_SIZE={isize}\n" \
-                  "PRIMER_MAX_SIZE={asize}\n" \
-                  "PRIMER_MAX_NS_ACCEPTED=0\n" \
-                  "PRIMER_PRODUCT_SIZE_RANGE={range}\n" \
-                  "PRIMER_PRODUCT_OPT_SIZE={osize}\n" \
-                  "PRIMER_PAIR_WT_PRODUCT_SIZE_GT=0.1\n" \
-                  "PRIMER_PAIR_WT_PRODUCT_SIZE_LT=0.1\n" \
-                  "P3_FILE_FLAG=1\n" \
-                  "SEQUENCE_INTERNAL_EXCLUDED_REGION=37,21\n" \
-                  "PRIMER_EXPLAIN_FLAG=1\n" \
-                  "PRIMER_MIN_TM={it}\n" \
-                  "PRIMER_MAX_TM={at}\n" \
-                  "PRIMER_NUM_RETURN=200\n" \
-                  "=".format(seq=self.template, tar=self.target,
-                             exc=self.excluded_region,
-                             gc=self.opt_gc_perc,
-                             size=self.opt_prim_length,
-                             isize=self.opt_prim_length-5,
-                             asize=self.opt_prim_length+5,
-                             range=self.range,
-                             osize=self.opt_size,
-                             it=self.min_melting_t,
-                             at=self.max_melting_t
-                             )
-
-        handle.write(cfg_str)
-
-    def run(self):
-        cfg = NamedTemporaryFile(delete=False, mode="w")
-        out = NamedTemporaryFile()
-
-        self.create_config(cfg)
-        cfg.close()
-        args = [self.primer3_exe, "-output", out.name, cfg.name]
-
-        _ = check_call(args)  # noqa
-
-        retval = []
-        with open(out.name) as handle:
-            for l in handle:
-                retval.append(l.strip())
-
-        out.close()
-        os.remove(cfg.name)
-
-        return retval
-
+    @property
+    def min_prim_length(self):
+        return self.opt_prim_length - 5
 
-def _parse_single_pair_id(id, lines):
-    """Parse single pair id"""
-    left_seq_key = "PRIMER_LEFT_{0}_SEQUENCE=".format(id)
-    right_seq_key = "PRIMER_RIGHT_{0}_SEQUENCE=".format(id)
-    left_pos_key = "PRIMER_LEFT_{0}=".format(id)
-    right_pos_key = "PRIMER_RIGHT_{0}=".format(id)
-    left_gc_key = "PRIMER_LEFT_{0}_GC_PERCENT".format(id)
-    right_gc_key = "PRIMER_RIGHT_{0}_GC_PERCENT".format(id)
+    @property
+    def max_prim_length(self):
+        return self.opt_prim_length + 5
+
+    def create_config(self):
+        """Create config for primer3. Returns the config as a string"""
+        cfg = [
+            "SEQUENCE_TEMPLATE=" + str(self.template),
+            "SEQUENCE_TARGET=" + str(self.target),
+            "SEQUENCE_EXCLUDED_REGION=" + str(self.excluded_region),
+            "PRIMER_OPT_GC_PERCENT=" + str(self.opt_gc_perc),
+            "PRIMER_OPT_SIZE=" + str(self.opt_prim_length),
+            "PRIMER_MIN_SIZE=" + str(self.min_prim_length),
+            "PRIMER_MAX_SIZE=" + str(self.max_prim_length),
+            "PRIMER_PRODUCT_SIZE_RANGE=" + self.range,
+            "PRIMER_PRODUCT_OPT_SIZE=" + str(self.opt_size),
+            "PRIMER_MIN_TM=" + str(self.min_melting_t),
+            "PRIMER_MAX_TM=" + str(self.max_melting_t),
+            "="
+        ]
+        return _STATIC_CFG + "\n".join(cfg) + "\n"
 
-    left_seq_line = [x for x in lines if x.startswith(left_seq_key)]
-    right_seq_line = [x for x in lines if x.startswith(right_seq_key)]
-    left_pos_line = [x for x in lines if x.startswith(left_pos_key)]
-    right_pos_line = [x for x in lines if x.startswith(right_pos_key)]
-    left_gc_line = [x for x in lines if x.startswith(left_gc_key)]
-    right_gc_line = [x for x in lines if x.startswith(right_gc_key)]
+    def run(self):
+        """
+        Run primer3 with config on stdin.
+        :return: dict of primer3 output keys and values
+        :raises CalledProcessError: if primer3 exits with non-zero code.
+        primer3's stderr is available as its `stderr` attribute
+        """
+        args = [self.primer3_exe]
+        proc = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                     universal_newlines=True)
+        stdout, stderr = proc.communicate(self.create_config())
+        if proc.returncode != 0:
+            # set stderr as attribute, python < 3.5 has no stderr argument
+            error = CalledProcessError(proc.returncode, args, output=stdout)
+            error.stderr = stderr
+            raise error
+
+        kv = {}
+        for line in stdout.splitlines():
+            if line.startswith("#"):
+                continue
+            k, sep, v = line.partition("=")
+            if sep:
+                kv[k] = v
+
+        return kv
+
+
+def _parse_single_pair(id, kv):
+    """Parse single pair id from a dict of primer3 output"""
+    left = "PRIMER_LEFT_" + str(id)
+    right = "PRIMER_RIGHT_" + str(id)
 
     d = {}
-    for name, val in zip(
+    for name, key in zip(
             ["left", "right", "left_gc", "right_gc"],
-            [left_seq_line, right_seq_line, left_gc_line, right_gc_line]
+            [left + "_SEQUENCE", right + "_SEQUENCE",
+             left + "_GC_PERCENT", right + "_GC_PERCENT"]
     ):
-        if len(val) != 1:
+        try:
+            d[name] = kv[key]
+        except KeyError:
             raise ValueError("Value for {n} "
                              "must have exactly one match".format(n=name))
-        d[name] = val[0].split("=")[-1]
 
-    for name, val in zip(["left_pos", "right_pos"],
-                         [left_pos_line, right_pos_line]):
-        if len(val) != 1:
-            raise ValueError("Vale for {n} "
+    for name, key in zip(["left_pos", "right_pos"], [left, right]):
+        try:
+            d[name] = kv[key].split(",")[0]
+        except KeyError:
+            raise ValueError("Value for {n} "
                              "must have exactly one match".format(n=name))
-        d[name] = val[0].split("=")[-1].split(",")[0]
 
-    return Primer(**d)
+    # same type as calc_gc, so GC values can be compared directly
+    d["left_gc"] = float(d["left_gc"])
+    d["right_gc"] = float(d["right_gc"])
 
+    return Primer(**d)
 
-def parse_primer3_output(lines):
-    """Parse primer3 output to Primers"""
-    seq_re = re.compile('^PRIMER_LEFT_(\d+)_SEQUENCE=.+$')
 
-    matches = [seq_re.match(x) for x in lines]
-    pair_ids = [int(x.group(1)) for x in matches if x is not None]
+def parse_primer3_output(kv):
+    """Parse primer3 output (as returned by `Primer3.run`) to Primers"""
+    pair_ids = []
+    for key in kv:
+        if key.startswith(_SEQ_PREFIX) and key.endswith(_SEQ_SUFFIX):
+            id = key[len(_SEQ_PREFIX):-len(_SEQ_SUFFIX)]
+            if id.isdigit():
+                pair_ids.append(int(id))
+    pair_ids.sort()
 
     for id in pair_ids:
-        yield _parse_single_pair_id(id, lines)
+        yield _parse_single_pair(id, kv)
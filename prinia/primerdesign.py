@@ -5,6 +5,12 @@ Output in Miracle XML or TSV
 """
 
 import argparse
+from collections import deque
+from multiprocessing import Pool
+import os
+import shutil
+from tempfile import mkdtemp
+import warnings
 
 from prinia.lovd import var_from_lovd
 from prinia.design import get_primer_from_region
@@ -16,64 +22,127 @@ from prinia.utils import generate_fastq_from_primers, NoPrimersException
 __author__ = 'ahbbollen'
 
 
+def _design_region(task):
+    """
+    Run get_primer_from_region for a single (region, kwargs) task.
+    Must be a module-level function so it can be sent to a worker process.
+    If output_bam is None, a private temporary bam file is used.
+    :return: 2-tuple of (regions, primers), or the NoPrimersException
+    if no primers were found
+    """
+    region, kwargs = task
+    tmp_dir = None
+    if kwargs["output_bam"] is None:
+        tmp_dir = mkdtemp()
+        kwargs = dict(kwargs, output_bam=os.path.join(tmp_dir, "primers.bam"))
+    try:
+        return get_primer_from_region(region, **kwargs)
+    except NoPrimersException as e:
+        return e
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir)
+
+
+def _design_regions(regions, jobs=1, **kwargs):
+    """
+    Design primers for regions using `jobs` processes.
+    Results are yielded in the same order as the input regions.
+    Regions are consumed lazily; at most 2 * jobs are in flight at a time.
+    With more than one job, each region is aligned to its own temporary
+    bam file, as concurrent runs cannot share output_bam.
+    :return: generator of (regions, primers) or NoPrimersException
+    per region
+    """
+    if jobs > 1:
+        kwargs["output_bam"] = None
+    tasks = ((region, kwargs) for region in regions)
+    if jobs <= 1:
+        for task in tasks:
+            yield _design_region(task)
+    else:
+        pool = Pool(jobs)
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(pool.apply_async(_design_region, (task,)))
+                if len(pending) >= 2 * jobs:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+
 def primers_from_lovd(lovd_file, padding, product_size, n_prims, reference,
                       bwa_exe, samtools_exe, primer3_exe, output_bam, dbsnp,
                       field, max_freq, m13=False, m13_f="", m13_r="",
                       strict=False, min_margin=10, ignore_errors=False,
-                      **prim_args):
+                      jobs=1, **prim_args):
     """**prim_args will be passed on to primer3"""
 
     variants = var_from_lovd(lovd_file)
+    regions = [Region.from_variant(var, padding_l=padding, padding_r=padding)
+               for var in variants]
     primers = []
-    for var in variants:
-        region = Region.from_variant(var, padding_l=padding, padding_r=padding)
-        try:
-            _, prims = get_primer_from_region(region, reference, product_size,
-                                              n_prims, bwa_exe, samtools_exe,
-                                              primer3_exe,
-                                              output_bam=output_bam,
-                                              dbsnp=dbsnp, field=field,
-                                              max_freq=max_freq, strict=strict,
-                                              min_margin=min_margin,
-                                              **prim_args)
-            primers.append(prims[0])
-        except NoPrimersException:
+    for result in _design_regions(regions, jobs=jobs,
+                                  reference=reference,
+                                  product_size=product_size,
+                                  n_prims=n_prims, bwa_exe=bwa_exe,
+                                  samtools_exe=samtools_exe,
+                                  primer3_exe=primer3_exe,
+                                  output_bam=output_bam,
+                                  dbsnp=dbsnp, field=field,
+                                  max_freq=max_freq, strict=strict,
+                                  min_margin=min_margin, **prim_args):
+        if isinstance(result, NoPrimersException):
             if ignore_errors:
                 continue
             else:
-                raise NoPrimersException
+                raise result
+        _, prims = result
+        primers.append(prims[0])
     if m13:
         primers = m13_primers(primers, m13_f, m13_r)
 
     return variants, primers
 
 
+def _regions_from_bed(bed_path, reference, padding):
+    """Lazily read regions from a BED file, skipping track lines"""
+    with open(bed_path, "r") as bed:
+        for line in bed:
+            if line.startswith("track"):  # ignore tracklines
+                continue
+            yield Region.from_bed(line, reference, padding_l=padding,
+                                  padding_r=padding)
+
+
 def primers_from_region(bed_path, padding, product_size, n_prims, reference,
                         bwa_exe, samtools_exe, primer3_exe, output_bam,
                         dbsnp, field, max_freq, m13=False, m13_f="",
-                        m13_r="", strict=False, min_margin=10,
+                        m13_r="", strict=False, min_margin=10, jobs=1,
                         **prim_args):
     """**prim_args will be passed on to primer3"""
     regions = []
     primers = []
-    with open(bed_path, "r") as bed:
-        for line in bed:
-            if line.startswith("track"):  # ignore tracklines
-                continue
-            region = Region.from_bed(line, reference, padding_l=padding,
-                                     padding_r=padding)
-            regs, prims = get_primer_from_region(region, reference,
-                                                 product_size, n_prims,
-                                                 bwa_exe, samtools_exe,
-                                                 primer3_exe,
-                                                 output_bam=output_bam,
-                                                 dbsnp=dbsnp, field=field,
-                                                 max_freq=max_freq,
-                                                 strict=strict,
-                                                 min_margin=min_margin,
-                                                 **prim_args)
-            regions += regs
-            primers += prims
+    bed_regions = _regions_from_bed(bed_path, reference, padding)
+    for result in _design_regions(bed_regions, jobs=jobs,
+                                  reference=reference,
+                                  product_size=product_size,
+                                  n_prims=n_prims, bwa_exe=bwa_exe,
+                                  samtools_exe=samtools_exe,
+                                  primer3_exe=primer3_exe,
+                                  output_bam=output_bam,
+                                  dbsnp=dbsnp, field=field,
+                                  max_freq=max_freq, strict=strict,
+                                  min_margin=min_margin, **prim_args):
+        if isinstance(result, NoPrimersException):
+            raise result
+        regs, prims = result
+        regions += regs
+        primers += prims
 
     if m13:
         primers = m13_primers(primers, m13_f, m13_r)
@@ -95,28 +164,28 @@ def primers_to_xml(object, primers, xml, type='variants', sample=None):
 
 
 def primers_to_tsv(object, primers, tsv, type='variants', sample='NA'):
-    with open(tsv, "wb") as handle:
+    if type == 'variants':
+        header = ['Sample', 'Chromosome', 'Hgvs (genomic)', 'transcript',
+                  'hgvs (transcript)', 'fragment', 'forward', 'reverse']
+    else:
+        header = ['Sample', 'Chr', 'Start', 'Stop', "size", "search_size",
+                  'other_information',  'fragment', 'forward', 'reverse']
+    lines = ["\t".join(header) + "\n"]
+
+    for o, prim in zip(object, primers):
+        line = []
         if type == 'variants':
-            header = ['Sample', 'Chromosome', 'Hgvs (genomic)', 'transcript',
-                      'hgvs (transcript)', 'fragment', 'forward', 'reverse']
+            line += [o.miracle_id, o.chromosome, o.variant_on_genome,
+                     o.transcript_id_ncbi,
+                     o.variant_on_transcript_dna]
         else:
-            header = ['Sample', 'Chr', 'Start', 'Stop', "size", "search_size",
-                      'other_information',  'fragment', 'forward', 'reverse']
-        headerline = "\t".join(header) + "\n"
-        handle.write(headerline.encode())
-
-        for o, prim in zip(object, primers):
-            line = []
-            if type == 'variants':
-                line += [o.miracle_id, o.chromosome, o.variant_on_genome,
-                         o.transcript_id_ncbi,
-                         o.variant_on_transcript_dna]
-            else:
-                line += [sample, o.chr, o.start, o.stop, len(o),
-                         o.size(padded=True), o.other_information]
-            line += [prim.fragment_sequence, prim.left, prim.right]
-            linest = "\t".join(map(str, line)) + "\n"
-            handle.write(linest.encode())
+            line += [sample, o.chr, o.start, o.stop, len(o),
+                     o.size(padded=True), o.other_information]
+        line += [prim.fragment_sequence, prim.left, prim.right]
+        lines.append("\t".join(map(str, line)) + "\n")
+
+    with open(tsv, "wb") as handle:
+        handle.write("".join(lines).encode("utf-8"))
 
 
 def m13_primers(primers, m13_for, m13_rev):
@@ -142,8 +211,10 @@ def main():
     output_group.add_argument('-t', '--tsv', help="Output TSV file")
 
     parser.add_argument('-b', '--bam',
-                        help="Path to output BAM file containing primers",
-                        required=True)
+                        help="Path to output BAM file containing primers. "
+                             "Only written when --jobs is 1. If not given, "
+                             "a temporary BAM file is used",
+                        default=None)
 
     parser.add_argument('-s', '--sample', help="Same ID for regions")
 
@@ -203,6 +274,10 @@ def main():
 
     parser.add_argument("--ignore-errors", help="Ignore errors",
                         action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of regions or variants to design "
+                             "primers for in parallel (default = 1). "
+                             "--bam is ignored when this is more than 1")
 
     parser.add_argument("--opt-primer-length",
                         help="Optimum primer length (default = 25)",
@@ -233,6 +308,13 @@ def main():
     if args.field and not args.allele_freq:
         raise ValueError("Must set an allele frequency")
 
+    if args.jobs < 1:
+        raise ValueError("Must use at least one job")
+
+    if args.bam and args.jobs > 1:
+        warnings.warn("--bam is ignored when running with more than one "
+                      "job; no BAM file will be written")
+
     primers = []
     if args.lovd and args.xml:
         variants, primers = primers_from_lovd(args.lovd, args.padding,
@@ -246,7 +328,8 @@ def main():
                                               args.m13_reverse,
                                               args.strict,
                                               args.min_margin,
-                                              args.ignore_errors)
+                                              args.ignore_errors,
+                                              jobs=args.jobs)
         primers_to_xml(variants, primers, args.xml, type='variants')
 
     elif args.region and args.xml:
@@ -260,7 +343,8 @@ def main():
                                                args.m13, args.m13_forward,
                                                args.m13_reverse,
                                                args.strict,
-                                               args.min_margin)
+                                               args.min_margin,
+                                               jobs=args.jobs)
         primers_to_xml(regions, primers, args.xml, type='regions',
                        sample=args.sample)
 
@@ -276,7 +360,8 @@ def main():
                                               args.m13_reverse,
                                               args.strict,
                                               args.min_margin,
-                                              args.ignore_errors)
+                                              args.ignore_errors,
+                                              jobs=args.jobs)
         primers_to_tsv(variants, primers, args.tsv, type='variants')
 
     elif args.region and args.tsv:
@@ -290,7 +375,8 @@ def main():
                                                args.m13, args.m13_forward,
                                                args.m13_reverse,
                                                args.strict,
-                                               args.min_margin)
+                                               args.min_margin,
+                                               jobs=args.jobs)
         primers_to_tsv(regions, primers, args.tsv, type='regions',
                        sample=args.sample)
     else:
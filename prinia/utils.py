@@ -1,18 +1,13 @@
-from builtins import (open, range)
+from builtins import open
 __author__ = 'ahbbollen'
 
 from datetime import datetime
 import hashlib
 import sys
-import re
+import uuid
 
 import vcf
 
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
-from Bio.Alphabet import NucleotideAlphabet
-
 
 def _is_vcf_version_at_least_0_6_8():
     """
@@ -46,19 +41,17 @@ def is_at_least_version_samtools(version_str, version_tupl):
     :raises ValueError: if version_tupl is not a 2-tuple
     :raises TypeError: if version_tupl contains non-integer
     """
-    regex = re.compile('^(\d+)\.(\d+).*$')
-    if " " not in version_str:
-        match = regex.match(version_str)
-    else:
-        match = regex.match(version_str.split(" ")[-1])
+    words = version_str.split()
+    major, _, rest = (words[-1] if words else "").partition(".")
+    minor = rest[:len(rest) - len(rest.lstrip("0123456789"))]
     if len(version_tupl) != 2:
         raise ValueError
     if not all([isinstance(x, int) for x in version_tupl]):
         raise TypeError
-    if match is None:
+    if not major.isdigit() or not minor:
         raise ValueError("Unparsable version string")
 
-    return (int(match.group(1)), int(match.group(2))) >= version_tupl
+    return (int(major), int(minor)) >= version_tupl
 
 
 def calc_gc(sequence):
@@ -70,10 +63,8 @@ def calc_gc(sequence):
     """
     if len(sequence) == 0:
         raise ValueError("Sequence must have minimum length 1")
-    gc = 0
-    for char in sequence:
-        if char.upper() == 'G' or char == 'C':
-            gc += 1
+    upper = sequence.upper()
+    gc = upper.count("G") + upper.count("C")
     return float(gc)/len(sequence) * 100.0
 
 
@@ -93,43 +84,24 @@ def datehash():
     return hash[:5]
 
 
-def primer_to_seq_record(primer):
-    """
-    Create seqrecord from a primer
-    :param primer: primer
-    :return: 2-tuple of (SeqRecord forward, SeqRecord reverse)
-    """
-    id_str = datehash()
-    forward_id = "{0}/1".format(id_str)
-    reverse_id = "{0}/2".format(id_str)
-    forward_seq = Seq(primer.left, alphabet=NucleotideAlphabet)
-    reverse_seq = Seq(primer.right, alphabet=NucleotideAlphabet)
-    forward_q = [40 for _ in range(len(primer.left))]
-    reverse_q = [40 for _ in range(len(primer.right))]
-    forward_r = SeqRecord(forward_seq, id=id_str, description=forward_id)
-    forward_r.letter_annotations['phred_quality'] = forward_q
-    reverse_r = SeqRecord(reverse_seq, id=id_str, description=reverse_id)
-    reverse_r.letter_annotations['phred_quality'] = reverse_q
-    return forward_r, reverse_r
-
-
 def generate_fastq_from_primers(primers, forward_path, reverse_path):
     """
     Generate paired-end fastq files from list of primers
+    Qualities are all sanger-encoded 40 ('I')
+    Read ids are a random per-batch prefix followed by a counter
     :param primers:
     :return: 2-tuple of (path_R1, path_R2)
     """
-    forward_handle = open(forward_path, "w")
-    reverse_handle = open(reverse_path, "w")
-
-    seqs = [primer_to_seq_record(x) for x in primers]
-    forwards = [s[0] for s in seqs]
-    reverses = [s[1] for s in seqs]
-
-    SeqIO.write(forwards, forward_handle, "fastq")
-    SeqIO.write(reverses, reverse_handle, "fastq")
-
-    forward_handle.close()
-    reverse_handle.close()
+    batch_id = uuid.uuid4().hex[:6]
+    with open(forward_path, "w", buffering=1 << 20) as forward_handle, \
+            open(reverse_path, "w", buffering=1 << 20) as reverse_handle:
+        for i, primer in enumerate(primers):
+            id_str = "{0}{1:05x}".format(batch_id, i)
+            forward_handle.write("@{0} {0}/1\n{1}\n+\n{2}\n".format(
+                id_str, primer.left, "I" * len(primer.left)
+            ))
+            reverse_handle.write("@{0} {0}/2\n{1}\n+\n{2}\n".format(
+                id_str, primer.right, "I" * len(primer.right)
+            ))
 
     return forward_path, reverse_path
@@ -0,0 +1,69 @@
+"""
+test_design.py
+~~~~~~~~~~~~~~
+
+:copyright: (c) 2018 Sander Bollen
+:copyright: (c) 2018 Leiden University Medical Center
+:license: MIT
+"""
+import os
+import stat
+
+import pytest
+
+from prinia import design
+
+
+@pytest.fixture
+def fake_fasta(monkeypatch):
+    opened = []
+
+    def fasta(reference):
+        opened.append(reference)
+        return object()
+
+    monkeypatch.setattr(design, "Fasta", fasta)
+    monkeypatch.setattr(design, "_FASTA_HANDLES", {})
+    return opened
+
+
+def test_get_fasta_cached_per_reference(fake_fasta):
+    first = design._get_fasta("a.fa")
+    assert design._get_fasta("a.fa") is first
+    assert fake_fasta == ["a.fa"]
+
+    assert design._get_fasta("b.fa") is not first
+    assert fake_fasta == ["a.fa", "b.fa"]
+
+
+def test_get_fasta_cached_per_process(fake_fasta, monkeypatch):
+    first = design._get_fasta("a.fa")
+    monkeypatch.setattr(design.os, "getpid", lambda: -1)
+    assert design._get_fasta("a.fa") is not first
+    assert design._get_fasta("a.fa") is design._get_fasta("a.fa")
+    assert fake_fasta == ["a.fa", "a.fa"]
+
+
+def fake_samtools(tmpdir, version_output, exit_code=0):
+    calls = tmpdir.join("calls")
+    exe = tmpdir.join("samtools")
+    exe.write("#!/bin/sh\n"
+              "echo called >> {0}\n"
+              "echo '{1}'\n"
+              "exit {2}\n".format(calls, version_output, exit_code))
+    os.chmod(str(exe), os.stat(str(exe)).st_mode | stat.S_IEXEC)
+    return str(exe), calls
+
+
+@pytest.mark.parametrize("version_output, exit_code, expected", [
+    ("samtools 1.9", 0, True),
+    ("samtools 1.2", 0, False),
+    ("", 1, False)
+])
+def test_samtools_version_check_cached(tmpdir, monkeypatch, version_output,
+                                       exit_code, expected):
+    monkeypatch.setattr(design, "_SAMTOOLS_VERSION_CHECKS", {})
+    exe, calls = fake_samtools(tmpdir, version_output, exit_code)
+    assert design.samtools_version_check(exe) is expected
+    assert design.samtools_version_check(exe) is expected
+    assert calls.read().splitlines() == ["called"]
@@ -0,0 +1,92 @@
+"""
+test_primer3.py
+~~~~~~~~~~~~~~~
+
+:copyright: (c) 2018 Sander Bollen
+:copyright: (c) 2018 Leiden University Medical Center
+:license: MIT
+"""
+import os
+import stat
+from subprocess import CalledProcessError
+
+import pytest
+
+from prinia.primer3 import Primer3, parse_primer3_output
+
+primer3_output = {
+    "SEQUENCE_ID": "example",
+    "PRIMER_PAIR_NUM_RETURNED": "2",
+    "PRIMER_LEFT_0_SEQUENCE": "CAGCACTGCTTGAGGGGAA",
+    "PRIMER_RIGHT_0_SEQUENCE": "TTCCCCTCAAGCAGTGCTG",
+    "PRIMER_LEFT_0": "10,19",
+    "PRIMER_RIGHT_0": "250,19",
+    "PRIMER_LEFT_0_GC_PERCENT": "57.895",
+    "PRIMER_RIGHT_0_GC_PERCENT": "57.895",
+    "PRIMER_LEFT_1_SEQUENCE": "GGGCCCAAATTT",
+    "PRIMER_RIGHT_1_SEQUENCE": "AAATTTGGGCCC",
+    "PRIMER_LEFT_1": "12,12",
+    "PRIMER_RIGHT_1": "260,12",
+    "PRIMER_LEFT_1_GC_PERCENT": "50.000",
+    "PRIMER_RIGHT_1_GC_PERCENT": "50.000",
+    "": ""
+}
+
+
+def test_parse_primer3_output():
+    primers = list(parse_primer3_output(primer3_output))
+    assert len(primers) == 2
+    assert primers[0].left == "CAGCACTGCTTGAGGGGAA"
+    assert primers[0].right == "TTCCCCTCAAGCAGTGCTG"
+    assert primers[0].left_pos == "10"
+    assert primers[0].right_pos == "250"
+    assert primers[0].left_gc == 57.895
+    assert primers[1].right_gc == 50.0
+
+
+def test_parse_primer3_output_missing_key():
+    kv = dict(primer3_output)
+    del kv["PRIMER_RIGHT_1_SEQUENCE"]
+    with pytest.raises(ValueError):
+        list(parse_primer3_output(kv))
+
+
+def test_create_config():
+    p3 = Primer3("primer3_core", "ACGT", "1,2", "1,2")
+    cfg = p3.create_config()
+    lines = cfg.splitlines()
+    assert "SEQUENCE_TEMPLATE=ACGT" in lines
+    assert "SEQUENCE_TARGET=1,2" in lines
+    assert "PRIMER_PRODUCT_SIZE_RANGE=200-600" in lines
+    assert "P3_FILE_FLAG=0" in lines
+    assert cfg.endswith("\n=\n")
+
+
+def test_run(tmpdir, capfd):
+    exe = tmpdir.join("primer3_core")
+    exe.write("#!/bin/sh\n"
+              "cat > /dev/null\n"
+              "echo 'ignored on stderr' >&2\n"
+              "echo 'SEQUENCE_ID=example'\n"
+              "echo 'PRIMER_LEFT_0=10,19'\n"
+              "echo '='\n")
+    os.chmod(str(exe), os.stat(str(exe)).st_mode | stat.S_IEXEC)
+    p3 = Primer3(str(exe), "ACGT", "1,2", "1,2")
+    kv = p3.run()
+    assert capfd.readouterr().err == ""
+    assert kv["SEQUENCE_ID"] == "example"
+    assert kv["PRIMER_LEFT_0"] == "10,19"
+
+
+def test_run_error(tmpdir):
+    exe = tmpdir.join("primer3_core")
+    exe.write("#!/bin/sh\n"
+              "cat > /dev/null\n"
+              "echo 'PRIMER_ERROR=bad config' >&2\n"
+              "exit 255\n")
+    os.chmod(str(exe), os.stat(str(exe)).st_mode | stat.S_IEXEC)
+    p3 = Primer3(str(exe), "ACGT", "1,2", "1,2")
+    with pytest.raises(CalledProcessError) as excinfo:
+        p3.run()
+    assert excinfo.value.returncode == 255
+    assert "PRIMER_ERROR=bad config" in excinfo.value.stderr
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+test_primerdesign.py
+~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2018 Sander Bollen
+:copyright: (c) 2018 Leiden University Medical Center
+:license: MIT
+"""
+import io
+import os
+
+import pytest
+
+from prinia import primerdesign
+from prinia.models import Primer, Region, Variant
+from prinia.utils import NoPrimersException
+
+
+def fake_get_primer_from_region(region, **kwargs):
+    if region == 3:
+        raise NoPrimersException("No suitable primers could be detected")
+    with open(kwargs["output_bam"], "w") as handle:
+        handle.write("bam")
+    return [region], [kwargs["output_bam"]]
+
+
+@pytest.fixture
+def fake_design(monkeypatch):
+    monkeypatch.setattr(primerdesign, "get_primer_from_region",
+                        fake_get_primer_from_region)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_design_regions_order_and_errors(fake_design, tmpdir, jobs):
+    output_bam = str(tmpdir.join("out.bam"))
+    results = list(primerdesign._design_regions(range(6), jobs=jobs,
+                                                output_bam=output_bam))
+    assert len(results) == 6
+    assert isinstance(results[3], NoPrimersException)
+    assert str(results[3]) == "No suitable primers could be detected"
+    ok = results[:3] + results[4:]
+    assert [regs for regs, _ in ok] == [[0], [1], [2], [4], [5]]
+
+
+def test_design_regions_single_job_uses_output_bam(fake_design, tmpdir):
+    output_bam = str(tmpdir.join("out.bam"))
+    results = list(primerdesign._design_regions([0, 1], jobs=1,
+                                                output_bam=output_bam))
+    assert [bams for _, bams in results] == [[output_bam], [output_bam]]
+
+
+def test_design_regions_private_bam(fake_design, tmpdir):
+    output_bam = str(tmpdir.join("out.bam"))
+    results = list(primerdesign._design_regions([0, 1, 2], jobs=2,
+                                                output_bam=output_bam))
+    bams = [bams[0] for _, bams in results]
+    assert len(set(bams)) == 3
+    for bam in bams:
+        assert bam != output_bam
+        assert not os.path.exists(os.path.dirname(bam))
+    assert not os.path.exists(output_bam)
+
+
+def test_design_regions_without_output_bam(fake_design):
+    results = list(primerdesign._design_regions([0], jobs=1,
+                                                output_bam=None))
+    bam = results[0][1][0]
+    assert not os.path.exists(os.path.dirname(bam))
+
+
+def test_primers_from_region_keeps_exception(monkeypatch, tmpdir):
+    def no_primers(region, **kwargs):
+        raise NoPrimersException("No suitable primers could be detected")
+
+    monkeypatch.setattr(primerdesign, "get_primer_from_region", no_primers)
+    bed = tmpdir.join("regions.bed")
+    bed.write("track name=test\nchr1\t100\t200\n")
+    with pytest.raises(NoPrimersException,
+                       match="No suitable primers could be detected"):
+        primerdesign.primers_from_region(str(bed), 10, "200-450", 4,
+                                         "ref.fa", "bwa", "samtools",
+                                         "primer3_core", "out.bam", None,
+                                         None, 0.0)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_design_regions_bounded(fake_design, tmpdir, jobs):
+    pulled = []
+
+    def regions():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    output_bam = str(tmpdir.join("out.bam"))
+    results = primerdesign._design_regions(regions(), jobs=jobs,
+                                           output_bam=output_bam)
+    first = next(results)
+    assert len(pulled) <= 2 * jobs
+    assert first[0] == [0]
+    assert len(list(results)) == 19
+    assert len(pulled) == 20
+
+
+def test_regions_from_bed(tmpdir):
+    bed = tmpdir.join("regions.bed")
+    bed.write("track name=test\nchr1\t100\t200\tgene\nchr2\t300\t400\n")
+    regions = primerdesign._regions_from_bed(str(bed), "ref.fa", 10)
+    first = next(regions)
+    assert (first.chr, first.start, first.stop) == ("chr1", 100, 200)
+    assert first.padding_left == first.padding_right == 10
+    assert [r.chr for r in regions] == ["chr2"]
+
+
+def test_primers_to_tsv_regions(tmpdir):
+    region = Region(chromosome="chr1", start=100, stop=200, acc_nr="NA",
+                    padding_left=10, padding_right=10,
+                    other=u"Ångström")
+    primer = Primer(fragment_sequence="ACGTACGT", left="ACG", right="CGT")
+    tsv = str(tmpdir.join("out.tsv"))
+    primerdesign.primers_to_tsv([region], [primer], tsv, type='regions',
+                                sample="S1")
+
+    with io.open(tsv, encoding="utf-8") as handle:
+        lines = handle.read().splitlines()
+    assert len(lines) == 2
+    assert lines[0].split("\t")[0] == "Sample"
+    assert lines[1].split("\t") == ["S1", "chr1", "100", "200", "100", "120",
+                                    u"Ångström", "ACGTACGT", "ACG",
+                                    "CGT"]
+
+
+@pytest.mark.parametrize("ignore_errors", [False, True])
+def test_primers_from_lovd_keeps_exception(monkeypatch, ignore_errors):
+    def no_primers(region, **kwargs):
+        raise NoPrimersException("No suitable primers could be detected")
+
+    monkeypatch.setattr(primerdesign, "var_from_lovd",
+                        lambda path: [Variant()])
+    monkeypatch.setattr(primerdesign, "get_primer_from_region", no_primers)
+    args = ("variants.lovd", 10, "200-450", 4, "ref.fa", "bwa", "samtools",
+            "primer3_core", "out.bam", None, None, 0.0)
+    if ignore_errors:
+        _, primers = primerdesign.primers_from_lovd(
+            *args, ignore_errors=True
+        )
+        assert primers == []
+    else:
+        with pytest.raises(NoPrimersException,
+                           match="No suitable primers could be detected"):
+            primerdesign.primers_from_lovd(*args)
@@ -8,7 +8,9 @@ test_utils.py
 """
 import pytest
 
-from prinia.utils import is_at_least_version_samtools
+from prinia.models import Primer
+from prinia.utils import (calc_gc, generate_fastq_from_primers,
+                          is_at_least_version_samtools)
 
 samtools_version_data = [
     ("1.9-33-g2d34e15", (1, 3), True),
@@ -17,7 +19,8 @@ samtools_version_data = [
     ("1.2", (1, 3), False),
     ("samtools 1.9-33-g2d34e15", (1, 3), True),
     ("samtools 1.9", (1, 3), True),
-    ("samtools 1.2", (1, 3), False)
+    ("samtools 1.2", (1, 3), False),
+    ("samtools 1.10\n", (1, 3), True)
 ]
 
 
@@ -26,3 +29,50 @@ samtools_version_data = [
 def test_is_at_least_version_samtools(version_str, version_tupl, expected):
     val = is_at_least_version_samtools(version_str, version_tupl)
     assert val == expected
+
+
+@pytest.mark.parametrize("version_str", ["", "samtools", "1", "a.9", "1.x"])
+def test_is_at_least_version_samtools_unparsable(version_str):
+    with pytest.raises(ValueError):
+        is_at_least_version_samtools(version_str, (1, 3))
+
+
+gc_data = [
+    ("GGCC", 100.0),
+    ("ggcc", 100.0),
+    ("ATAT", 0.0),
+    ("ACGT", 50.0),
+    ("acGT", 50.0),
+    ("ACGN", 50.0)
+]
+
+
+@pytest.mark.parametrize("sequence, expected", gc_data)
+def test_calc_gc(sequence, expected):
+    assert calc_gc(sequence) == expected
+
+
+def test_calc_gc_empty():
+    with pytest.raises(ValueError):
+        calc_gc("")
+
+
+def test_generate_fastq_from_primers(tmpdir):
+    primers = [Primer(left="ACGT", right="GGCCA"),
+               Primer(left="TTTT", right="CC")]
+    fq1 = str(tmpdir.join("R1.fq"))
+    fq2 = str(tmpdir.join("R2.fq"))
+    assert generate_fastq_from_primers(primers, fq1, fq2) == (fq1, fq2)
+
+    with open(fq1) as handle:
+        forward = handle.read().splitlines()
+    with open(fq2) as handle:
+        reverse = handle.read().splitlines()
+    assert len(forward) == len(reverse) == 8
+    assert forward[1::4] == ["ACGT", "TTTT"]
+    assert reverse[1::4] == ["GGCCA", "CC"]
+    assert forward[3::4] == ["IIII", "IIII"]
+    assert reverse[3::4] == ["IIIII", "II"]
+    for f, r in zip(forward[0::4], reverse[0::4]):
+        assert f.split()[0] == r.split()[0]
+    assert forward[0].split()[0] != forward[4].split()[0]